@@ -1,39 +1,126 @@
 """Alert tracking and triggering logic."""
 import asyncio
+import functools
 import logging
 import threading
+import time
 from datetime import datetime
-from collections import defaultdict
-from typing import Optional, Tuple
+from typing import Awaitable, List, Optional, Tuple
 
 from sqlalchemy.orm import Session
 
+try:
+    # C-implemented lock with a cheaper uncontended acquire/release than threading.Lock
+    from fastrlock.rlock import FastRLock as _StripeLock
+except ImportError:
+    _StripeLock = threading.Lock
+
 from .config import (
-    ALERT_THRESHOLD, MIN_ALERT_THRESHOLD, ALERT_EMAIL_DELAY_SECONDS
+    ALERT_THRESHOLD, MIN_ALERT_THRESHOLD, ALERT_EMAIL_DELAY_SECONDS,
+    SETTINGS_CACHE_TTL_SECONDS, NOTIFY_WORKERS, NOTIFY_QUEUE_SIZE
 )
 from .database import Settings
-from .notifications import send_email_with_logging, send_sms_message, send_whatsapp_message
 
-# Alert tracking state: monitors when alerts start and sends email only once after 10 seconds
-alert_tracking_state = {
-    "alert_start_time": defaultdict(lambda: None),
-    "email_sent": defaultdict(lambda: False),
+logger = logging.getLogger(__name__)
+
+# Alert tracking state: monitors when alerts start (as time.monotonic() values) and sends
+# email only once after 10 seconds.
+# The state is sharded into stripes keyed by device so concurrent devices don't contend on one lock.
+ALERT_TRACKING_STRIPES = 32
+
+
+class _AlertEntry:
+    """Tracking entry for a single active alert."""
+    __slots__ = ("start_time", "email_sent")
+
+    def __init__(self, start_time: float, email_sent: bool = False):
+        self.start_time = start_time
+        self.email_sent = email_sent
+
+
+alert_tracking_stripes = [
+    {"alerts": {}, "lock": _StripeLock()}
+    for _ in range(ALERT_TRACKING_STRIPES)
+]
+
+# Devices with at least one active alert; membership only changes under the device's stripe lock
+_active_devices = set()
+
+
+# Log message templates, formatted lazily by the logging module only when records are emitted
+_LOG_ALERT_STARTED = "Alert %s started. Will send email in %ss."
+_LOG_ALERT_SENDING = "Alert %s has been running for %.1fs. Sending email."
+_LOG_ALERT_ALREADY_SENT = "Alert %s is ongoing but email already sent."
+_LOG_ALERT_RUNNING = "Alert %s running for %.1fs. Email will be sent in %.1fs."
+_LOG_ALERT_CLEARED = "Alert %s cleared."
+
+# Notification templates; thresholds come from config and never change, so format them once
+_MIN_THRESHOLD_STR = f"{MIN_ALERT_THRESHOLD:.1f}"
+_MAX_THRESHOLD_STR = f"{ALERT_THRESHOLD:.1f}"
+_EMAIL_BODY_TMPL = (
+    "<p><strong>Alert:</strong> {cause}</p>"
+    "<p>Device: {device}</p>"
+    "<p>Location: {location}</p>"
+    "<p>Temperature: {temp}°C</p>"
+    "<p>Thresholds: min {min}°C, max {max}°C</p>"
+    "<p>Record ID: {rid}</p>"
+    "<p>Time: {time}</p>"
+)
+_SMS_TMPL = "IoT Alert: {cause} at {location}. Temp: {temp}°C (min: {min}°C, max: {max}°C)"
+_WA_TMPL = "🚨 IoT Alert: {cause}\nLocation: {location}\nTemperature: {temp}°C\nThresholds: {min}°C - {max}°C"
+
+
+@functools.lru_cache(maxsize=1024)
+def _keys_for(device_id: str) -> Tuple[str, str]:
+    """Return the (high, low) alert keys for a device, built once per device."""
+    return f"{device_id}_HIGH_TEMP", f"{device_id}_LOW_TEMP"
+
+
+def _stripe_for(device_id: str) -> dict:
+    """Return the tracking stripe that owns the given device's alerts."""
+    return alert_tracking_stripes[hash(device_id) % ALERT_TRACKING_STRIPES]
+
+# Settings cache: the settings row changes rarely, so avoid querying it on every alert
+_settings_cache = {
+    "value": None,
+    "expires_at": 0.0,
+    "version": 0,
     "lock": threading.Lock()
 }
 
 
+def _detached_settings(row: Settings) -> Settings:
+    """Copy a settings row into a transient instance that is safe to share across sessions."""
+    return Settings(**{c.name: getattr(row, c.name) for c in Settings.__table__.columns})
+
+
 def get_settings(db: Session) -> Optional[Settings]:
-    """Get application settings from database."""
-    return db.query(Settings).filter(Settings.id == 1).first()
+    """Get application settings, served from an in-memory cache with a short TTL."""
+    if time.monotonic() < _settings_cache["expires_at"]:
+        return _settings_cache["value"]
 
+    with _settings_cache["lock"]:
+        if time.monotonic() < _settings_cache["expires_at"]:
+            return _settings_cache["value"]
+        version = _settings_cache["version"]
 
-def determine_alert_cause(temperature: float, min_threshold: float, max_threshold: float) -> Optional[str]:
-    """Determine the cause of a temperature alert."""
-    if temperature >= max_threshold:
-        return "HIGH_TEMP"
-    elif temperature <= min_threshold:
-        return "LOW_TEMP"
-    return None
+    row = db.get(Settings, 1)
+    value = _detached_settings(row) if row is not None else None
+
+    with _settings_cache["lock"]:
+        # Only store the result if no update invalidated the cache while we were querying
+        if version == _settings_cache["version"]:
+            _settings_cache["value"] = value
+            _settings_cache["expires_at"] = time.monotonic() + SETTINGS_CACHE_TTL_SECONDS
+    return value
+
+
+def invalidate_settings_cache() -> None:
+    """Drop the cached settings so the next read goes to the database."""
+    with _settings_cache["lock"]:
+        _settings_cache["value"] = None
+        _settings_cache["expires_at"] = 0.0
+        _settings_cache["version"] += 1
 
 
 def check_and_trigger_alert(
@@ -49,39 +136,46 @@ def check_and_trigger_alert(
     Check if alert conditions are met and trigger alert dispatch if needed.
     Returns tuple of (is_alert_active, alert_cause).
     """
-    alert_cause = determine_alert_cause(temperature, min_threshold, max_threshold)
+    # Threshold rule kept inline to skip a function call on every sensor event
+    if temperature >= max_threshold:
+        alert_cause = "HIGH_TEMP"
+    elif temperature <= min_threshold:
+        alert_cause = "LOW_TEMP"
+    else:
+        alert_cause = None
+    alert_key_high, alert_key_low = _keys_for(device_id)
     
     if alert_cause:  # Alert is active
-        alert_key = f"{device_id}_{alert_cause}"
+        alert_key = alert_key_high if alert_cause == "HIGH_TEMP" else alert_key_low
         should_send_email = False
+        stripe = _stripe_for(device_id)
         
-        with alert_tracking_state["lock"]:
-            now = datetime.utcnow()
-            alert_start = alert_tracking_state["alert_start_time"][alert_key]
-            email_sent = alert_tracking_state["email_sent"][alert_key]
+        with stripe["lock"]:
+            now = time.monotonic()
+            entry = stripe["alerts"].get(alert_key)
+            is_new = entry is None
             
-            if alert_start is None:
-                alert_tracking_state["alert_start_time"][alert_key] = now
-                alert_tracking_state["email_sent"][alert_key] = False
-                print(f"[ALERT_TRACK] NEW ALERT DETECTED: {alert_key}")
-                print(f"[ALERT_TRACK] Alert start time recorded: {now.isoformat()}")
-                print(f"[ALERT_TRACK] Will send email in {ALERT_EMAIL_DELAY_SECONDS} seconds")
-                logging.info(f"Alert {alert_key} started. Will send email in {ALERT_EMAIL_DELAY_SECONDS}s.")
+            if is_new:
+                stripe["alerts"][alert_key] = _AlertEntry(now)
+                _active_devices.add(device_id)
             else:
-                elapsed = (now - alert_start).total_seconds()
+                elapsed = now - entry.start_time
+                email_sent = entry.email_sent
                 if elapsed >= ALERT_EMAIL_DELAY_SECONDS and not email_sent:
                     should_send_email = True
-                    alert_tracking_state["email_sent"][alert_key] = True
-                    print(f"[ALERT_TRACK] ALERT THRESHOLD MET: {alert_key} running for {elapsed:.1f}s")
-                    print(f"[ALERT_TRACK] Triggering email send NOW")
-                    logging.info(f"Alert {alert_key} has been running for {elapsed:.1f}s. Sending email.")
-                elif email_sent:
-                    print(f"[ALERT_TRACK] Alert {alert_key} ongoing - Email already sent, skipping duplicate")
-                    logging.info(f"Alert {alert_key} is ongoing but email already sent.")
-                else:
-                    time_remaining = ALERT_EMAIL_DELAY_SECONDS - elapsed
-                    print(f"[ALERT_TRACK] Alert {alert_key} running {elapsed:.1f}s - {time_remaining:.1f}s until email")
-                    logging.info(f"Alert {alert_key} running for {elapsed:.1f}s. Email will be sent in {time_remaining:.1f}s.")
+                    entry.email_sent = True
+        
+        # Log outside the lock so concurrent sensor events don't wait on I/O
+        if is_new:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Alert %s start time recorded: %s", alert_key, datetime.utcnow().isoformat())
+            logging.info(_LOG_ALERT_STARTED, alert_key, ALERT_EMAIL_DELAY_SECONDS)
+        elif should_send_email:
+            logging.info(_LOG_ALERT_SENDING, alert_key, elapsed)
+        elif email_sent:
+            logger.debug(_LOG_ALERT_ALREADY_SENT, alert_key)
+        else:
+            logger.debug(_LOG_ALERT_RUNNING, alert_key, elapsed, ALERT_EMAIL_DELAY_SECONDS - elapsed)
         
         # Send alert notifications if needed
         if should_send_email:
@@ -90,25 +184,99 @@ def check_and_trigger_alert(
         return True, alert_cause
     
     else:  # Alert cleared
-        alert_key_high = f"{device_id}_HIGH_TEMP"
-        alert_key_low = f"{device_id}_LOW_TEMP"
+        # Steady state: nothing was alerting for this device, so there is nothing to clear
+        if device_id not in _active_devices:
+            return False, None
         
-        with alert_tracking_state["lock"]:
-            if alert_tracking_state["alert_start_time"][alert_key_high] is not None:
-                alert_tracking_state["alert_start_time"][alert_key_high] = None
-                alert_tracking_state["email_sent"][alert_key_high] = False
-                print(f"[ALERT_TRACK] ALERT CLEARED: {alert_key_high}")
-                logging.info(f"Alert {alert_key_high} cleared.")
-            
-            if alert_tracking_state["alert_start_time"][alert_key_low] is not None:
-                alert_tracking_state["alert_start_time"][alert_key_low] = None
-                alert_tracking_state["email_sent"][alert_key_low] = False
-                print(f"[ALERT_TRACK] ALERT CLEARED: {alert_key_low}")
-                logging.info(f"Alert {alert_key_low} cleared.")
+        stripe = _stripe_for(device_id)
+        with stripe["lock"]:
+            cleared_high = stripe["alerts"].pop(alert_key_high, None) is not None
+            cleared_low = stripe["alerts"].pop(alert_key_low, None) is not None
+            _active_devices.discard(device_id)
+        
+        if cleared_high:
+            logging.info(_LOG_ALERT_CLEARED, alert_key_high)
+        if cleared_low:
+            logging.info(_LOG_ALERT_CLEARED, alert_key_low)
         
         return False, None
 
 
+# Notification queue: alert sends are handed to a fixed pool of workers so provider
+# latency never lands on the ingest path and outbound concurrency stays bounded
+_notify_state = {
+    "queue": None,
+    "workers": []
+}
+
+
+async def _notify_worker(queue: "asyncio.Queue[List[Tuple[str, Awaitable[None]]]]") -> None:
+    """Consume queued alert notifications forever."""
+    while True:
+        jobs = await queue.get()
+        try:
+            await _dispatch_all(jobs)
+        except Exception:
+            logging.exception("Notification worker failed to dispatch alert")
+        finally:
+            queue.task_done()
+
+
+def start_notification_workers() -> None:
+    """Create the notification queue and its worker tasks on the running event loop."""
+    if _notify_state["queue"] is not None:
+        return
+    queue = asyncio.Queue(maxsize=NOTIFY_QUEUE_SIZE)
+    _notify_state["queue"] = queue
+    _notify_state["workers"] = [asyncio.create_task(_notify_worker(queue)) for _ in range(NOTIFY_WORKERS)]
+    logging.info("Started %d notification workers", NOTIFY_WORKERS)
+
+
+def stop_notification_workers() -> None:
+    """Cancel the notification workers; pending notifications are discarded."""
+    for worker in _notify_state["workers"]:
+        worker.cancel()
+    queue = _notify_state["queue"]
+    _notify_state["queue"] = None
+    _notify_state["workers"] = []
+    if queue is None:
+        return
+    # Close queued sends that will never run so they don't warn as un-awaited coroutines
+    dropped = 0
+    while not queue.empty():
+        for _, job in queue.get_nowait():
+            job.close()
+            dropped += 1
+    if dropped:
+        logging.warning("Dropped %d pending alert notifications on shutdown", dropped)
+
+
+def _enqueue_notifications(jobs: List[Tuple[str, Awaitable[None]]]) -> None:
+    """Hand an alert's notification sends to the worker pool, dropping them if it is saturated."""
+    queue = _notify_state["queue"]
+    if queue is None:
+        # Workers not started (e.g. used outside the app); dispatch directly
+        asyncio.create_task(_dispatch_all(jobs))
+        return
+    try:
+        queue.put_nowait(jobs)
+    except asyncio.QueueFull:
+        logging.warning("Notification queue full; dropping %s alert notifications",
+                        ", ".join(channel for channel, _ in jobs))
+        for _, job in jobs:
+            job.close()
+
+
+async def _dispatch_all(jobs: List[Tuple[str, Awaitable[None]]]) -> None:
+    """Run the notification sends for one alert concurrently and log each channel's outcome."""
+    results = await asyncio.gather(*(job for _, job in jobs), return_exceptions=True)
+    for (channel, _), result in zip(jobs, results):
+        if isinstance(result, BaseException):
+            logging.error("%s alert dispatch failed: %s", channel, result)
+        else:
+            logger.debug("%s alert dispatch finished", channel)
+
+
 def dispatch_alert(
     temperature: float,
     device_id: str,
@@ -119,6 +287,7 @@ def dispatch_alert(
 ) -> None:
     """Dispatch alert notifications via email, SMS, and WhatsApp."""
     cfg = get_settings(db)
+    jobs: List[Tuple[str, Awaitable[None]]] = []
     
     # Email dispatch
     email_is_enabled = cfg.email_enabled if cfg and hasattr(cfg, 'email_enabled') else True
@@ -126,75 +295,73 @@ def dispatch_alert(
     recipients = [r.strip() for r in recipients_csv.split(',') if r.strip()]
     
     if email_is_enabled and recipients:
-        subject = f"IoT Alert: {alert_cause or 'THRESHOLD_EXCEEDED'} at {location}"
-        body = (
-            f"<p><strong>Alert:</strong> {alert_cause or 'THRESHOLD_EXCEEDED'}</p>"
-            f"<p>Device: {device_id}</p>"
-            f"<p>Location: {location}</p>"
-            f"<p>Temperature: {temperature:.1f}°C</p>"
-            f"<p>Thresholds: min {MIN_ALERT_THRESHOLD:.1f}°C, max {ALERT_THRESHOLD:.1f}°C</p>"
-            f"<p>Record ID: {record_id}</p>"
-            f"<p>Time: {datetime.utcnow().isoformat()}</p>"
-        )
+        # Looked up at dispatch time rather than bound at import
+        from .notifications import send_email_with_logging, send_sms_message, send_whatsapp_message
         
-        print(f"[ALERT_TRACK] Dispatching email task...")
-        asyncio.create_task(send_email_with_logging(recipients, subject, body, record_id, alert_cause))
-        print(f"[ALERT_TRACK] Email alert task created for {len(recipients)} recipients")
-        logging.info(f"Email alert scheduled to {len(recipients)} recipients")
+        fields = {
+            "cause": alert_cause or "THRESHOLD_EXCEEDED",
+            "device": device_id,
+            "location": location,
+            "temp": f"{temperature:.1f}",
+            "min": _MIN_THRESHOLD_STR,
+            "max": _MAX_THRESHOLD_STR,
+            "rid": record_id,
+            "time": datetime.utcnow().isoformat(),
+        }
+        subject = f"IoT Alert: {fields['cause']} at {location}"
+        body = _EMAIL_BODY_TMPL.format_map(fields)
+        
+        jobs.append(("Email", send_email_with_logging(recipients, subject, body, record_id, alert_cause)))
+        logging.info("Email alert scheduled to %d recipients", len(recipients))
         
         # SMS dispatch
         sms_is_enabled = cfg.sms_enabled if cfg and hasattr(cfg, 'sms_enabled') else False
         phone = cfg.phone_number if cfg and cfg.phone_number else "+212638776450"
         if sms_is_enabled:
-            sms_text = f"IoT Alert: {alert_cause} at {location}. Temp: {temperature:.1f}°C (min: {MIN_ALERT_THRESHOLD:.1f}°C, max: {ALERT_THRESHOLD:.1f}°C)"
-            print(f"[ALERT_TRACK] Dispatching SMS task to {phone}...")
-            asyncio.create_task(send_sms_message(phone, sms_text))
-            print(f"[ALERT_TRACK] SMS alert task created for {phone}")
-            logging.info(f"SMS alert scheduled to {phone}")
+            sms_text = _SMS_TMPL.format_map({**fields, "cause": alert_cause})
+            jobs.append(("SMS", send_sms_message(phone, sms_text)))
+            logging.info("SMS alert scheduled to %s", phone)
         else:
-            print(f"[ALERT_TRACK] SMS sending is disabled")
             logging.info("SMS sending is disabled. Skipping SMS alert.")
         
         # WhatsApp dispatch
         whatsapp_is_enabled = cfg.whatsapp_enabled if cfg and hasattr(cfg, 'whatsapp_enabled') else False
         whatsapp_number = cfg.whatsapp_number if cfg and cfg.whatsapp_number else None
         if whatsapp_is_enabled and whatsapp_number:
-            whatsapp_text = f"🚨 IoT Alert: {alert_cause}\nLocation: {location}\nTemperature: {temperature:.1f}°C\nThresholds: {MIN_ALERT_THRESHOLD:.1f}°C - {ALERT_THRESHOLD:.1f}°C"
-            print(f"[ALERT_TRACK] Dispatching WhatsApp task to {whatsapp_number}...")
-            asyncio.create_task(send_whatsapp_message(whatsapp_number, whatsapp_text))
-            print(f"[ALERT_TRACK] WhatsApp alert task created for {whatsapp_number}")
-            logging.info(f"WhatsApp alert scheduled to {whatsapp_number}")
+            whatsapp_text = _WA_TMPL.format_map({**fields, "cause": alert_cause})
+            jobs.append(("WhatsApp", send_whatsapp_message(whatsapp_number, whatsapp_text)))
+            logging.info("WhatsApp alert scheduled to %s", whatsapp_number)
         elif whatsapp_is_enabled and not whatsapp_number:
-            print(f"[ALERT_TRACK] WhatsApp is enabled but no number configured")
             logging.info("WhatsApp is enabled but no recipient number configured.")
+        
+        # Fan out all channels in a single job so their HTTP round-trips overlap
+        _enqueue_notifications(jobs)
     else:
         if not email_is_enabled:
-            print(f"[ALERT_TRACK] Email sending is disabled")
             logging.info("Email sending is disabled. Skipping email alert.")
         elif not recipients:
-            print(f"[ALERT_TRACK] No email recipients configured")
             logging.info("No email recipients configured. Skipping email alert.")
 
 
 def get_alert_status() -> dict:
     """Get current status of all alerts."""
-    with alert_tracking_state["lock"]:
-        status = {}
-        for alert_key, start_time in alert_tracking_state["alert_start_time"].items():
-            if start_time is not None:
-                elapsed = (datetime.utcnow() - start_time).total_seconds()
+    status = {}
+    now = time.monotonic()
+    for stripe in alert_tracking_stripes:
+        with stripe["lock"]:
+            for alert_key, entry in stripe["alerts"].items():
                 status[alert_key] = {
                     "is_active": True,
-                    "elapsed_seconds": elapsed,
-                    "email_sent": alert_tracking_state["email_sent"][alert_key]
+                    "elapsed_seconds": now - entry.start_time,
+                    "email_sent": entry.email_sent
                 }
-        return status
+    return status
 
 
 def reset_alerts() -> None:
     """Reset all alert tracking states."""
-    with alert_tracking_state["lock"]:
-        alert_tracking_state["alert_start_time"].clear()
-        alert_tracking_state["email_sent"].clear()
-    print("[ALERT_TRACK] All alerts have been reset")
+    for stripe in alert_tracking_stripes:
+        with stripe["lock"]:
+            stripe["alerts"].clear()
+    _active_devices.clear()
     logging.info("All alerts have been reset")
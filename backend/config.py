@@ -19,6 +19,17 @@ ALERT_THRESHOLD = float(os.getenv("ALERT_THRESHOLD", "35"))
 MIN_ALERT_THRESHOLD = float(os.getenv("MIN_ALERT_THRESHOLD", "15"))
 LDR_ALERT_THRESHOLD = float(os.getenv("LDR_ALERT_THRESHOLD", "300"))
 ALERT_EMAIL_DELAY_SECONDS = 10  # Send email 10 seconds after alert starts
+SETTINGS_CACHE_TTL_SECONDS = 30  # How long the cached settings row stays fresh
+NOTIFY_WORKERS = 4  # Concurrent notification dispatch workers
+NOTIFY_QUEUE_SIZE = 1000  # Pending alert notifications before new ones are dropped
+NOTIFY_HTTP_TIMEOUT_SECONDS = 10  # Timeout for Brevo/Infobip/Twilio API requests
+NOTIFY_HTTP_ATTEMPTS = 3  # Tries per provider request when it answers 429 or 5xx
+NOTIFY_HTTP_BACKOFF_SECONDS = 0.5  # Base delay before a retry, doubled on each attempt
+
+# CSV export
+CSV_QUEUE_SIZE = 10000  # Pending CSV rows before new ones are dropped
+CSV_BATCH_SIZE = 100  # Max rows written per batch
+CSV_FLUSH_INTERVAL_SECONDS = 1.0  # How long a batch waits for more rows before it is written
 
 # Location coordinates
 FIXED_LAT = os.getenv("FIXED_LAT", "33.9885407")
@@ -27,6 +38,8 @@ FIXED_LON = os.getenv("FIXED_LON", "-6.8570454")
 # Weather API
 OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY", "")
 OPENWEATHER_BASE_URL = "https://api.openweathermap.org/data/2.5/weather"
+WEATHER_CACHE_TTL_SECONDS = 120  # Reuse one OpenWeather response for this long
+WEATHER_STALE_GRACE_SECONDS = 900  # Keep serving the last good reading this long while OpenWeather fails
 
 # SMS Configuration (Infobip)
 INFOBIP_MESSAGES_URL = os.getenv("INFOBIP_MESSAGES_URL", "")
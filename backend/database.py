@@ -1,24 +1,48 @@
 """Database models for the IoT application."""
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, create_engine
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Index, create_engine, event
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import QueuePool
 from pydantic import BaseModel, Field, ConfigDict
 from typing import Optional
 
 from .config import DATABASE_URL
 
 # Database setup
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False, "timeout": 30},
+    poolclass=QueuePool,
+    pool_size=10,
+    max_overflow=20,
+    pool_pre_ping=True,
+    query_cache_size=1200,
+)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 Base = declarative_base()
 
 
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Use WAL journaling, a larger page cache and memory-mapped I/O for faster SQLite access."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA cache_size=-64000")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.close()
+
+
 class SensorRecord(Base):
     """SQLAlchemy model for sensor readings."""
     __tablename__ = "sensor_records"
+    __table_args__ = (
+        Index("ix_sensor_device_ts", "device_id", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    device_id = Column(String, index=True)
+    device_id = Column(String)
     temperature = Column(Float)
     humidity = Column(Float)
     outdoor_temperature = Column(Float)
@@ -56,6 +80,9 @@ class Settings(Base):
 class EmailAlert(Base):
     """SQLAlchemy model for email alert logs."""
     __tablename__ = "email_alerts"
+    __table_args__ = (
+        Index("ix_email_status_ts", "status", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     timestamp = Column(DateTime, index=True, default=datetime.utcnow)
@@ -91,7 +118,7 @@ class SensorRecordOut(BaseModel):
     sensor_disagreement: Optional[bool] = None
     alert_cause: Optional[str] = None
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True, frozen=True)
 
 
 class SettingsOut(BaseModel):
@@ -108,7 +135,7 @@ class SettingsOut(BaseModel):
     whatsapp_enabled: bool
     whatsapp_number: Optional[str] = None
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True, frozen=True)
 
 
 class EmailAlertOut(BaseModel):
@@ -123,7 +150,7 @@ class EmailAlertOut(BaseModel):
     alert_record_id: Optional[int] = None
     alert_cause: Optional[str] = None
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True, frozen=True)
 
 
 def get_db():
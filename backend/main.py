@@ -11,14 +11,16 @@ This is the main entry point for the application. It orchestrates:
 import os
 import asyncio
 import logging
+import orjson
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import List, Optional, Set
 
 from fastapi import FastAPI, HTTPException, Depends, WebSocket, WebSocketDisconnect, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, StreamingResponse, RedirectResponse
-from sqlalchemy import func, text, inspect
+from starlette.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse, RedirectResponse, ORJSONResponse
+from sqlalchemy import Float, Integer, String, func, text, inspect, select, insert, update
 from sqlalchemy.orm import Session
 
 # Import all modules
@@ -36,13 +38,16 @@ from .schemas import (
     AlertStatus, AlertReset, AlertList
 )
 from .alerts import (
-    check_and_trigger_alert, get_alert_status, reset_alerts,
-    ALERT_EMAIL_DELAY_SECONDS, alert_tracking_state
+    check_and_trigger_alert, get_alert_status, reset_alerts, invalidate_settings_cache,
+    get_settings as get_cached_settings,
+    start_notification_workers, stop_notification_workers,
+    ALERT_EMAIL_DELAY_SECONDS, alert_tracking_stripes
 )
-from .notifications import send_email_with_logging
+from .notifications import send_email_with_logging, close_http_client
 from .utils import (
     get_daily_csv_path, ensure_daily_csv_file, append_record_to_csv,
-    fetch_weather, validate_temperature_readings
+    start_csv_writer, stop_csv_writer, close_weather_client,
+    cached_weather, validate_temperature_readings
 )
 
 # Configure logging
@@ -50,7 +55,7 @@ logging.basicConfig(level=getattr(logging, LOG_LEVEL, logging.INFO))
 logger = logging.getLogger(__name__)
 
 # FastAPI app initialization
-app = FastAPI(title="IoT Sensor Backend", version="2.0")
+app = FastAPI(title="IoT Sensor Backend", version="2.0", default_response_class=ORJSONResponse)
 
 # CORS middleware
 app.add_middleware(
@@ -73,30 +78,126 @@ async def swagger_redirect():
 
 
 # ==================== EventBroker for WebSockets ====================
+BROADCAST_BATCH_SIZE = 50  # Connections sent to concurrently before yielding to the event loop
+SSE_QUEUE_SIZE = 32  # Pending updates per SSE client before the oldest is dropped
+
+
 class EventBroker:
-    """Manages WebSocket connections for real-time event broadcasting."""
+    """Manages WebSocket connections and SSE subscribers for real-time event broadcasting."""
     
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        self.active_connections: Set[WebSocket] = set()
+        self.sse_queues: Set[asyncio.Queue] = set()
     
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.active_connections.add(websocket)
     
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        self.active_connections.discard(websocket)
     
-    async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except Exception:
-                pass
+    async def broadcast(self, payload: bytes):
+        """Send a pre-serialized JSON payload to every client (as text, since dashboards JSON.parse it)."""
+        payload = payload.decode()
+        connections = list(self.active_connections)
+        failed = []
+        for start in range(0, len(connections), BROADCAST_BATCH_SIZE):
+            if start:
+                await asyncio.sleep(0)
+            batch = connections[start:start + BROADCAST_BATCH_SIZE]
+            results = await asyncio.gather(
+                *(connection.send_text(payload) for connection in batch),
+                return_exceptions=True
+            )
+            failed.extend(c for c, result in zip(batch, results) if isinstance(result, Exception))
+        
+        for connection in failed:
+            self.disconnect(connection)
+    
+    def publish_sse(self, payload: bytes):
+        """Queue a pre-serialized JSON payload for every SSE subscriber, dropping the oldest if full."""
+        for queue in list(self.sse_queues):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(payload)
 
 
 event_broker = EventBroker()
 
 
+# SensorRecordOut field names, read once so output payloads skip Pydantic validation
+_SR_FIELDS = tuple(SensorRecordOut.model_fields)
+
+
+def record_to_payload(record: SensorRecord) -> dict:
+    """Return a sensor record as a SensorRecordOut-shaped dict, ready for orjson."""
+    return {field: getattr(record, field) for field in _SR_FIELDS}
+
+
+def _event_data(record: SensorRecord) -> dict:
+    """Return the WS/SSE event body for a sensor record, without empty fields."""
+    return {field: value for field, value in record_to_payload(record).items() if value is not None}
+
+
+async def publish_sensor_update(record: SensorRecord):
+    """Push a newly stored sensor record to WebSocket and SSE clients."""
+    data = _event_data(record)
+    event_broker.publish_sse(orjson.dumps(data))
+    await event_broker.broadcast(orjson.dumps({"type": "sensor_update", "data": data}))
+
+
+# Frequently executed statements, built once so SQLAlchemy's compiled cache is hit on every call
+LATEST_RECORD_STMT = select(SensorRecord).order_by(SensorRecord.id.desc()).limit(1)
+LATEST_RECORD_ID_STMT = select(func.max(SensorRecord.id))
+INSERT_SENSOR_RECORD_STMT = insert(SensorRecord.__table__)
+
+
+def _as_int(value) -> int:
+    """Coerce an Integer column value, refusing to silently truncate fractional numbers."""
+    number = float(value) if isinstance(value, str) else value
+    if number != int(number):
+        raise ValueError(f"Expected an integer value, got {value!r}")
+    return int(number)
+
+
+# Per-column casts applied before insert, so records pushed over WS/SSE carry the same
+# types as the SensorRecordOut HTTP response
+_CASTS_BY_TYPE = ((Float, float), (Integer, _as_int), (String, str))
+_COLUMN_CASTS = tuple(
+    (column.name, cast)
+    for column in SensorRecord.__table__.columns if not column.primary_key
+    for column_type, cast in _CASTS_BY_TYPE if isinstance(column.type, column_type)
+)
+
+# ID of the newest sensor record, kept current by the ingest endpoints so the latest
+# record can be fetched by primary key instead of sorting the table
+latest_record_state = {"id": 0}
+
+
+def get_latest_record(db: Session) -> Optional[SensorRecord]:
+    """Return the newest sensor record, looked up by its tracked primary key."""
+    record = db.get(SensorRecord, latest_record_state["id"]) if latest_record_state["id"] else None
+    if record is None:
+        # Nothing tracked yet (startup seed failed) or the row is gone; fall back to the sorted lookup
+        record = db.execute(LATEST_RECORD_STMT).scalar_one_or_none()
+    return record
+
+
+def _latest_event_payload() -> Optional[bytes]:
+    """Serialize the newest sensor record for a new SSE subscriber; blocking, so run it in the threadpool."""
+    db = SessionLocal()
+    try:
+        record = get_latest_record(db)
+        return orjson.dumps(_event_data(record)) if record is not None else None
+    finally:
+        db.close()
+
+
+def _track_latest_record(record_id: int) -> None:
+    """Advance the tracked latest ID; concurrent ingests may finish out of order, so never move it back."""
+    latest_record_state["id"] = max(latest_record_state["id"], record_id)
+
+
 # ==================== Database Initialization ====================
 @app.on_event("startup")
 async def ensure_database_exists():
@@ -105,51 +206,61 @@ async def ensure_database_exists():
         Base.metadata.create_all(bind=engine)
         print("[DB] Tables created/verified")
         
-        with engine.connect() as conn:
-            inspector = inspect(engine)
-            
-            # Verify and add columns to sensor_records table
-            sr_cols = {c['name'] for c in inspector.get_columns('sensor_records')}
-            columns_to_add = [
-                ('ldr_value', "ALTER TABLE sensor_records ADD COLUMN ldr_value INTEGER"),
-                ('ldr_alert', "ALTER TABLE sensor_records ADD COLUMN ldr_alert INTEGER"),
-                ('ds18b20_temperature', "ALTER TABLE sensor_records ADD COLUMN ds18b20_temperature FLOAT"),
-                ('dht_temperature', "ALTER TABLE sensor_records ADD COLUMN dht_temperature FLOAT"),
-                ('temperature_source', "ALTER TABLE sensor_records ADD COLUMN temperature_source TEXT"),
-                ('ds18b20_ok', "ALTER TABLE sensor_records ADD COLUMN ds18b20_ok BOOLEAN DEFAULT 1"),
-                ('dht_ok', "ALTER TABLE sensor_records ADD COLUMN dht_ok BOOLEAN DEFAULT 1"),
-                ('sensor_disagreement', "ALTER TABLE sensor_records ADD COLUMN sensor_disagreement BOOLEAN DEFAULT 0"),
-                ('alert_cause', "ALTER TABLE sensor_records ADD COLUMN alert_cause TEXT"),
-            ]
-            
-            for col_name, sql in columns_to_add:
-                if col_name not in sr_cols:
-                    try:
-                        conn.execute(text(sql))
-                        logging.info(f"Added column sensor_records.{col_name}")
-                    except Exception:
-                        pass
-            
-            # Verify and add columns to settings table
-            s_cols = {c['name'] for c in inspector.get_columns('settings')}
-            settings_columns = [
-                ('brevo_sender_email', "ALTER TABLE settings ADD COLUMN brevo_sender_email TEXT"),
-                ('brevo_sender_name', "ALTER TABLE settings ADD COLUMN brevo_sender_name TEXT DEFAULT 'IoT Monitor'"),
-                ('whatsapp_enabled', "ALTER TABLE settings ADD COLUMN whatsapp_enabled BOOLEAN DEFAULT 0"),
-                ('whatsapp_number', "ALTER TABLE settings ADD COLUMN whatsapp_number TEXT"),
-            ]
-            
-            for col_name, sql in settings_columns:
-                if col_name not in s_cols:
+        # create_all() skips indexes on tables that already exist, so add any new ones explicitly
+        for table in (SensorRecord.__table__, EmailAlert.__table__):
+            for index in table.indexes:
+                index.create(bind=engine, checkfirst=True)
+        
+        inspector = inspect(engine)
+        sr_cols = {c['name'] for c in inspector.get_columns('sensor_records')}
+        s_cols = {c['name'] for c in inspector.get_columns('settings')}
+        
+        # Columns added to sensor_records after the first release
+        columns_to_add = [
+            ('ldr_value', "ALTER TABLE sensor_records ADD COLUMN ldr_value INTEGER"),
+            ('ldr_alert', "ALTER TABLE sensor_records ADD COLUMN ldr_alert INTEGER"),
+            ('ds18b20_temperature', "ALTER TABLE sensor_records ADD COLUMN ds18b20_temperature FLOAT"),
+            ('dht_temperature', "ALTER TABLE sensor_records ADD COLUMN dht_temperature FLOAT"),
+            ('temperature_source', "ALTER TABLE sensor_records ADD COLUMN temperature_source TEXT"),
+            ('ds18b20_ok', "ALTER TABLE sensor_records ADD COLUMN ds18b20_ok BOOLEAN DEFAULT 1"),
+            ('dht_ok', "ALTER TABLE sensor_records ADD COLUMN dht_ok BOOLEAN DEFAULT 1"),
+            ('sensor_disagreement', "ALTER TABLE sensor_records ADD COLUMN sensor_disagreement BOOLEAN DEFAULT 0"),
+            ('alert_cause', "ALTER TABLE sensor_records ADD COLUMN alert_cause TEXT"),
+        ]
+        
+        # Columns added to settings after the first release
+        settings_columns = [
+            ('brevo_sender_email', "ALTER TABLE settings ADD COLUMN brevo_sender_email TEXT"),
+            ('brevo_sender_name', "ALTER TABLE settings ADD COLUMN brevo_sender_name TEXT DEFAULT 'IoT Monitor'"),
+            ('whatsapp_enabled', "ALTER TABLE settings ADD COLUMN whatsapp_enabled BOOLEAN DEFAULT 0"),
+            ('whatsapp_number', "ALTER TABLE settings ADD COLUMN whatsapp_number TEXT"),
+        ]
+        
+        missing = [
+            (f"sensor_records.{col_name}", sql) for col_name, sql in columns_to_add if col_name not in sr_cols
+        ] + [
+            (f"settings.{col_name}", sql) for col_name, sql in settings_columns if col_name not in s_cols
+        ]
+        
+        # Apply all missing columns in a single transaction; nothing to do on an up-to-date schema.
+        # pysqlite never opens a transaction before DDL, so BEGIN is issued explicitly; a failed
+        # ALTER only aborts that statement, leaving the rest of the transaction intact
+        if missing:
+            with engine.connect() as conn:
+                conn.exec_driver_sql("BEGIN")
+                for column, sql in missing:
                     try:
                         conn.execute(text(sql))
-                        logging.info(f"Added column settings.{col_name}")
+                        logging.info(f"Added column {column}")
                     except Exception:
                         pass
+                conn.commit()
         
         # Initialize default settings
         db = SessionLocal()
         try:
+            latest_record_state["id"] = db.execute(LATEST_RECORD_ID_STMT).scalar() or 0
+            
             cfg = db.query(Settings).filter(Settings.id == 1).first()
             if cfg is None:
                 cfg = Settings(
@@ -163,6 +274,7 @@ async def ensure_database_exists():
                 )
                 db.add(cfg)
                 db.commit()
+                invalidate_settings_cache()
                 print("[DB] Default settings created")
         finally:
             db.close()
@@ -172,8 +284,50 @@ async def ensure_database_exists():
         logging.exception("Database initialization failed on startup.")
 
 
+@app.on_event("startup")
+async def start_background_workers():
+    """Start the workers that deliver alert notifications and write the CSV export."""
+    start_notification_workers()
+    start_csv_writer()
+
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    """Stop the alert notification workers, flush pending CSV rows and close outbound HTTP clients."""
+    stop_notification_workers()
+    await stop_csv_writer()
+    await close_http_client()
+    await close_weather_client()
+
+
 # ==================== REST API Endpoints ====================
 
+def _insert_record(db: Session, fields: dict) -> SensorRecord:
+    """Insert a sensor record with a Core INSERT and return it as a detached instance.
+
+    Blocking, so callers run it in the threadpool.
+    """
+    for name, cast in _COLUMN_CASTS:
+        if fields.get(name) is not None:
+            fields[name] = cast(fields[name])
+    result = db.connection().execute(INSERT_SENSOR_RECORD_STMT, fields)
+    db.commit()
+    # Parameters as sent, including column defaults, plus the new primary key
+    values = result.last_inserted_params()
+    values["id"] = result.inserted_primary_key[0]
+    return SensorRecord(**values)
+
+
+def _mark_record_alert(db: Session, record_id: int, alert_cause: Optional[str]) -> None:
+    """Flag a stored sensor record as alerting; blocking, so callers run it in the threadpool."""
+    db.connection().execute(
+        update(SensorRecord.__table__)
+        .where(SensorRecord.__table__.c.id == record_id)
+        .values(alert=1, alert_cause=alert_cause)
+    )
+    db.commit()
+
+
 @app.get("/", response_class=FileResponse)
 async def serve_index():
     """Serve the main HTML file."""
@@ -194,25 +348,22 @@ async def post_data(payload: SensorData, db: Session = Depends(get_db)):
     - **location**: Device location name
     """
     try:
-        outdoor_temp, weather_condition = await fetch_weather()
-        
-        record = SensorRecord(
-            device_id=payload.device_id,
-            temperature=payload.temperature,
-            humidity=payload.humidity,
-            outdoor_temperature=outdoor_temp,
-            weather_condition=weather_condition,
-            alert=0,
-            timestamp=datetime.utcnow(),
-            ldr_value=payload.ldr_value
-        )
+        outdoor_temp, weather_condition = await cached_weather()
         
-        db.add(record)
-        db.commit()
-        db.refresh(record)
+        record = await run_in_threadpool(_insert_record, db, {
+            "device_id": payload.device_id,
+            "temperature": payload.temperature,
+            "humidity": payload.humidity,
+            "outdoor_temperature": outdoor_temp,
+            "weather_condition": weather_condition,
+            "alert": 0,
+            "timestamp": datetime.utcnow(),
+            "ldr_value": payload.ldr_value
+        })
+        _track_latest_record(record.id)
         
         # Append to daily CSV
-        await append_record_to_csv({
+        append_record_to_csv({
             "timestamp": record.timestamp,
             "device_id": record.device_id,
             "temperature": record.temperature,
@@ -224,7 +375,7 @@ async def post_data(payload: SensorData, db: Session = Depends(get_db)):
             "ldr_alert": None
         })
         
-        await event_broker.broadcast({"type": "sensor_update", "data": SensorRecordOut.from_orm(record).dict()})
+        await publish_sensor_update(record)
         
         return record
     except Exception as e:
@@ -248,62 +399,55 @@ async def post_sensor_data(payload: dict, db: Session = Depends(get_db)):
         ldr_value = payload.get('ldr_value')
         
         # Extract device_id and location (with defaults if not provided by ESP32)
-        device_id = payload.get('device_id', 'ESP32_01')
+        device_id = str(payload.get('device_id', 'ESP32_01'))
         location = payload.get('location', 'Unknown')
         
-        cfg = db.query(Settings).filter(Settings.id == 1).first()
-        threshold = cfg.alert_threshold if cfg else ALERT_THRESHOLD
-        min_threshold = cfg.min_alert_threshold if cfg else MIN_ALERT_THRESHOLD
-        
-        # Validate temperature readings
+        # Validate temperature readings first so malformed packets are rejected before any I/O
         temperature, temp_source, ds18b20_ok, dht_ok, sensor_disagree = validate_temperature_readings(
             ds18b20_temp,
             dht_temp
         )
         
+        cfg = get_cached_settings(db)
+        threshold = cfg.alert_threshold if cfg else ALERT_THRESHOLD
+        min_threshold = cfg.min_alert_threshold if cfg else MIN_ALERT_THRESHOLD
+        
         # Fetch weather
-        outdoor_temp, weather_condition = await fetch_weather()
+        outdoor_temp, weather_condition = await cached_weather()
         
-        # Create sensor record
-        alert_value = 0
-        alert_cause = None
+        # Store sensor record; alert fields are filled in once the record ID is known
+        record = await run_in_threadpool(_insert_record, db, {
+            "device_id": device_id,
+            "temperature": temperature,
+            "humidity": humidity,
+            "outdoor_temperature": outdoor_temp,
+            "weather_condition": weather_condition,
+            "alert": 0,
+            "timestamp": datetime.utcnow(),
+            "ldr_value": ldr_value,
+            "ds18b20_temperature": ds18b20_temp,
+            "dht_temperature": dht_temp,
+            "temperature_source": temp_source,
+            "ds18b20_ok": ds18b20_ok,
+            "dht_ok": dht_ok,
+            "sensor_disagreement": sensor_disagree,
+            "alert_cause": None
+        })
+        _track_latest_record(record.id)
+        
+        # Check alerts once, with the real record ID, and only write back if an alert is active
         is_alert, alert_cause = check_and_trigger_alert(
             temperature, device_id, location,
-            min_threshold, threshold, db, 0  # 0 for now, will be updated after DB insert
+            min_threshold, threshold, db, record.id
         )
         alert_value = 1 if is_alert else 0
-        
-        record = SensorRecord(
-            device_id=device_id,
-            temperature=temperature,
-            humidity=humidity,
-            outdoor_temperature=outdoor_temp,
-            weather_condition=weather_condition,
-            alert=alert_value,
-            timestamp=datetime.utcnow(),
-            ldr_value=ldr_value,
-            ds18b20_temperature=ds18b20_temp,
-            dht_temperature=dht_temp,
-            temperature_source=temp_source,
-            ds18b20_ok=ds18b20_ok,
-            dht_ok=dht_ok,
-            sensor_disagreement=sensor_disagree,
-            alert_cause=alert_cause
-        )
-        
-        db.add(record)
-        db.commit()
-        db.refresh(record)
-        
-        # Re-trigger alert now that we have the record ID
         if is_alert:
-            check_and_trigger_alert(
-                temperature, device_id, location,
-                min_threshold, threshold, db, record.id
-            )
+            await run_in_threadpool(_mark_record_alert, db, record.id, alert_cause)
+            record.alert = alert_value
+            record.alert_cause = alert_cause
         
         # Append to CSV
-        await append_record_to_csv({
+        append_record_to_csv({
             "timestamp": record.timestamp,
             "device_id": device_id,
             "temperature": temperature,
@@ -315,10 +459,7 @@ async def post_sensor_data(payload: dict, db: Session = Depends(get_db)):
             "ldr_alert": None
         })
         
-        await event_broker.broadcast({
-            "type": "sensor_update",
-            "data": SensorRecordOut.from_orm(record).dict()
-        })
+        await publish_sensor_update(record)
         
         logging.info(f"Sensor data recorded: device={device_id}, temp={temperature}°C, alert={alert_value}")
         return record
@@ -336,13 +477,12 @@ async def post_sensor_data(payload: dict, db: Session = Depends(get_db)):
 async def get_alerts():
     """Get current status of all active alerts."""
     status = get_alert_status()
+    now = datetime.utcnow()
     alerts = [
         AlertStatus(
             alert_type=alert_key,
             is_alert_active=data["is_active"],
-            alert_start_time=datetime.utcfromtimestamp(
-                (datetime.utcnow() - timedelta(seconds=data["elapsed_seconds"])).timestamp()
-            ).isoformat(),
+            alert_start_time=(now - timedelta(seconds=data["elapsed_seconds"])).isoformat(),
             email_sent=data["email_sent"]
         )
         for alert_key, data in status.items()
@@ -362,7 +502,7 @@ async def reset_alerts_endpoint():
 @app.get("/get_settings", response_model=SettingsOut)
 async def get_settings(db: Session = Depends(get_db)):
     """Get current application settings."""
-    settings = db.query(Settings).filter(Settings.id == 1).first()
+    settings = get_cached_settings(db)
     if not settings:
         raise HTTPException(status_code=404, detail="Settings not found")
     return settings
@@ -381,6 +521,7 @@ async def update_settings(update: SettingsUpdate, db: Session = Depends(get_db))
         
         db.commit()
         db.refresh(settings)
+        invalidate_settings_cache()
         logging.info(f"Settings updated: {update.dict(exclude_unset=True)}")
         return settings
     except Exception as e:
@@ -410,6 +551,7 @@ async def update_thresholds(
         
         db.commit()
         db.refresh(settings)
+        invalidate_settings_cache()
         
         return {
             "success": True,
@@ -426,7 +568,7 @@ async def update_thresholds(
 async def get_max_threshold(db: Session = Depends(get_db)):
     """Get maximum temperature threshold (for ESP32 compatibility)."""
     try:
-        settings = db.query(Settings).filter(Settings.id == 1).first()
+        settings = get_cached_settings(db)
         if not settings:
             raise HTTPException(status_code=404, detail="Settings not found")
         
@@ -442,7 +584,7 @@ async def get_max_threshold(db: Session = Depends(get_db)):
 async def get_min_threshold(db: Session = Depends(get_db)):
     """Get minimum temperature threshold (for ESP32 compatibility)."""
     try:
-        settings = db.query(Settings).filter(Settings.id == 1).first()
+        settings = get_cached_settings(db)
         if not settings:
             raise HTTPException(status_code=404, detail="Settings not found")
         
@@ -460,14 +602,14 @@ async def get_min_threshold(db: Session = Depends(get_db)):
 async def get_status(db: Session = Depends(get_db)):
     """Get current system status including settings and latest data."""
     try:
-        settings = db.query(Settings).filter(Settings.id == 1).first()
-        latest_record = db.query(SensorRecord).order_by(SensorRecord.id.desc()).first()
+        settings = get_cached_settings(db)
+        latest_record = get_latest_record(db)
         
         return {
             "status": "ok",
             "threshold": settings.alert_threshold if settings else ALERT_THRESHOLD,
             "min_threshold": settings.min_alert_threshold if settings else MIN_ALERT_THRESHOLD,
-            "latest_record": SensorRecordOut.from_orm(latest_record).dict() if latest_record else None
+            "latest_record": record_to_payload(latest_record) if latest_record else None
         }
     except Exception as e:
         logging.exception("Error fetching status")
@@ -478,15 +620,26 @@ async def get_status(db: Session = Depends(get_db)):
 async def get_latest_data(db: Session = Depends(get_db)):
     """Get the latest sensor record."""
     try:
-        latest = db.query(SensorRecord).order_by(SensorRecord.id.desc()).first()
+        latest = get_latest_record(db)
         if not latest:
             raise HTTPException(status_code=404, detail="No data available")
-        return SensorRecordOut.from_orm(latest)
+        return record_to_payload(latest)
     except Exception as e:
         logging.exception("Error fetching latest data")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _sensor_record_rows(db: Session, limit: int, offset: int) -> List[dict]:
+    """Newest-first sensor records as plain column dicts, skipping ORM objects and Pydantic."""
+    rows = db.execute(
+        select(*SensorRecord.__table__.columns)
+        .order_by(SensorRecord.timestamp.desc())
+        .limit(limit)
+        .offset(offset)
+    ).mappings().all()
+    return [dict(r) for r in rows]
+
+
 @app.get("/data/history")
 async def get_data_history(
     limit: int = Query(100, ge=1, le=1000),
@@ -495,22 +648,20 @@ async def get_data_history(
 ):
     """Get historical sensor records."""
     try:
-        records = db.query(SensorRecord).order_by(SensorRecord.timestamp.desc()).limit(limit).offset(offset).all()
-        return [SensorRecordOut.from_orm(r).dict() for r in records]
+        return ORJSONResponse(_sensor_record_rows(db, limit, offset))
     except Exception as e:
         logging.exception("Error fetching history")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/sensor-records", response_model=List[SensorRecordOut])
+@app.get("/sensor-records")
 async def get_sensor_records(
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
     db: Session = Depends(get_db)
 ):
     """Get sensor records with pagination."""
-    records = db.query(SensorRecord).order_by(SensorRecord.timestamp.desc()).limit(limit).offset(offset).all()
-    return records
+    return ORJSONResponse(_sensor_record_rows(db, limit, offset))
 
 
 @app.get("/email-alerts", response_model=List[EmailAlertOut])
@@ -520,7 +671,9 @@ async def get_email_alerts(
     db: Session = Depends(get_db)
 ):
     """Get email alert logs with pagination."""
-    alerts = db.query(EmailAlert).order_by(EmailAlert.timestamp.desc()).limit(limit).offset(offset).all()
+    alerts = db.execute(
+        select(EmailAlert).order_by(EmailAlert.timestamp.desc()).limit(limit).offset(offset)
+    ).scalars().all()
     return alerts
 
 
@@ -530,7 +683,7 @@ async def get_email_alerts(
 async def send_email_alert(payload: Optional[EmailTestIn] = None, db: Session = Depends(get_db)):
     """Send a test email alert."""
     try:
-        settings = db.query(Settings).filter(Settings.id == 1).first()
+        settings = get_cached_settings(db)
         if not settings or not settings.email_recipients:
             raise HTTPException(status_code=400, detail="No email recipients configured")
         
@@ -547,81 +700,52 @@ async def send_email_alert(payload: Optional[EmailTestIn] = None, db: Session =
 
 # ==================== WebSocket Endpoints ====================
 
-@app.websocket("/ws")
-async def websocket_endpoint_root(websocket: WebSocket):
-    """WebSocket endpoint for real-time event streaming (root path)."""
+async def _ws_handler(websocket: WebSocket):
+    """WebSocket endpoint for real-time event streaming.
+
+    Keep-alive is left to the server's protocol-level pings (uvicorn
+    ``ws_ping_interval``); the loop only waits for the client to go away.
+    """
     await event_broker.connect(websocket)
     try:
-        # Keep connection open and receive broadcasts
         while True:
-            try:
-                # Use longer timeout to reduce ping/disconnect cycles
-                await asyncio.wait_for(websocket.receive_text(), timeout=60)
-            except asyncio.TimeoutError:
-                # Send a ping to keep connection alive
-                try:
-                    await websocket.send_json({"type": "ping"})
-                except Exception:
-                    break
-            except Exception:
-                break
+            await websocket.receive_text()
     except WebSocketDisconnect:
+        pass
+    except Exception:
+        logging.exception("WebSocket error on %s", websocket.url.path)
+    finally:
         event_broker.disconnect(websocket)
-    except Exception as e:
-        logging.exception("WebSocket error on /ws")
-        if websocket in event_broker.active_connections:
-            event_broker.disconnect(websocket)
 
 
-@app.websocket("/ws/events")
-async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket endpoint for real-time event streaming."""
-    await event_broker.connect(websocket)
-    try:
-        # Keep connection open and receive broadcasts
-        while True:
-            try:
-                # Use longer timeout to reduce ping/disconnect cycles
-                await asyncio.wait_for(websocket.receive_text(), timeout=60)
-            except asyncio.TimeoutError:
-                # Send a ping to keep connection alive
-                try:
-                    await websocket.send_json({"type": "ping"})
-                except Exception:
-                    break
-            except Exception:
-                break
-    except WebSocketDisconnect:
-        event_broker.disconnect(websocket)
-    except Exception as e:
-        logging.exception("WebSocket error on /ws/events")
-        if websocket in event_broker.active_connections:
-            event_broker.disconnect(websocket)
+app.add_api_websocket_route("/ws", _ws_handler)
+app.add_api_websocket_route("/ws/events", _ws_handler)
 
 
 # ==================== Server-Sent Events ====================
 
 @app.get("/events")
-async def stream_events(db: Session = Depends(get_db)):
+async def stream_events():
     """Server-Sent Events endpoint for streaming sensor data."""
     
     async def event_generator():
-        last_id = 0
-        
-        while True:
-            latest_record = db.query(SensorRecord).order_by(SensorRecord.id.desc()).first()
-            
-            if latest_record and latest_record.id > last_id:
-                last_id = latest_record.id
-                record_dict = SensorRecordOut.from_orm(latest_record).dict()
-                
-                yield f"data: {record_dict}\n\n"
-            
-            await asyncio.sleep(1)
+        # Subscribe to the broker; records arrive as they are ingested, with no DB polling
+        queue = asyncio.Queue(maxsize=SSE_QUEUE_SIZE)
+        event_broker.sse_queues.add(queue)
+        try:
+            # Start the stream with the current latest record instead of waiting for the next ingest
+            latest = await run_in_threadpool(_latest_event_payload)
+            if latest is not None:
+                yield f"data: {latest.decode()}\n\n"
+            while True:
+                payload = await queue.get()
+                yield f"data: {payload.decode()}\n\n"
+        finally:
+            event_broker.sse_queues.discard(queue)
     
     return StreamingResponse(event_generator(), media_type="text/event-stream")
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(app, host="0.0.0.0", port=8000, ws_ping_interval=30)
@@ -1,141 +1,190 @@
 """Notification services for email, SMS, and WhatsApp alerts."""
 import asyncio
 import logging
+import random
 from typing import List, Optional
+
+import httpx
+import orjson
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
 
 from .config import (
     BREVO_API_KEY, BREVO_SENDER_EMAIL, BREVO_SENDER_NAME,
     INFOBIP_API_KEY_SANITIZED, INFOBIP_BASE_URL, INFOBIP_SENDER,
-    TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_WHATSAPP_FROM
+    TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_WHATSAPP_FROM,
+    NOTIFY_HTTP_TIMEOUT_SECONDS, NOTIFY_HTTP_ATTEMPTS, NOTIFY_HTTP_BACKOFF_SECONDS
 )
-from .database import EmailAlert
+from .database import EmailAlert, Settings
+from .utils import tls_context
+
+try:
+    # httpx needs the h2 package for HTTP/2; without it the client stays on HTTP/1.1
+    import h2  # noqa: F401
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Provider REST endpoints
+BREVO_EMAIL_URL = "https://api.brevo.com/v3/smtp/email"
+INFOBIP_SMS_PATH = "/sms/3/messages"
+TWILIO_MESSAGES_URL = "https://api.twilio.com/2010-04-01/Accounts/{sid}/Messages.json"
+
+# Request headers for the JSON APIs; bodies are pre-encoded with orjson and sent as content
+_INFOBIP_HEADERS = {
+    "Authorization": f"App {INFOBIP_API_KEY_SANITIZED}",
+    "Accept": "application/json",
+    "Content-Type": "application/json",
+}
+_BREVO_HEADERS = {
+    "api-key": BREVO_API_KEY,
+    "Accept": "application/json",
+    "Content-Type": "application/json",
+}
 
-# Infobip SDK imports
-from infobip_api_client.api_client import ApiClient, Configuration
-from infobip_api_client.api.sms_api import SmsApi
-from infobip_api_client.models.sms_request import SmsRequest
-from infobip_api_client.models.sms_message import SmsMessage
-from infobip_api_client.models.sms_destination import SmsDestination
-from infobip_api_client.models.sms_text_content import SmsTextContent
-from infobip_api_client.models.sms_message_content import SmsMessageContent
-from infobip_api_client.exceptions import ApiException
+# Brevo sender overrides stored in the settings row
+SENDER_CONFIG_STMT = select(Settings.brevo_sender_email, Settings.brevo_sender_name).where(Settings.id == 1)
+
+# One HTTP client shared by all providers, created on first use so its connection pool stays warm
+_http_state = {
+    "client": None
+}
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    """Return the shared provider HTTP client, creating it on first use."""
+    client = _http_state["client"]
+    if client is None:
+        # Connection settings live on the transport, which also retries failed connects
+        transport = httpx.AsyncHTTPTransport(
+            verify=tls_context(),
+            http2=_HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=50),
+            retries=NOTIFY_HTTP_ATTEMPTS - 1
+        )
+        client = httpx.AsyncClient(transport=transport, timeout=NOTIFY_HTTP_TIMEOUT_SECONDS)
+        _http_state["client"] = client
+    return client
 
-# Brevo (Sendinblue) SDK imports
-import sib_api_v3_sdk
-from sib_api_v3_sdk.rest import ApiException as BrevoApiException
 
-# Twilio SDK imports
-from twilio.rest import Client as TwilioClient
+async def _post_with_retry(url: str, **kwargs) -> httpx.Response:
+    """POST to a provider, retrying 429 and 5xx answers with exponential backoff and jitter."""
+    client = _get_http_client()
+    for attempt in range(NOTIFY_HTTP_ATTEMPTS):
+        response = await client.post(url, **kwargs)
+        if response.status_code != 429 and response.status_code < 500:
+            return response
+        if attempt + 1 < NOTIFY_HTTP_ATTEMPTS:
+            delay = NOTIFY_HTTP_BACKOFF_SECONDS * (2 ** attempt) * (1 + random.random())
+            logging.warning("%s answered %s; retrying in %.2fs", response.url.host, response.status_code, delay)
+            await asyncio.sleep(delay)
+    return response
+
+
+async def close_http_client() -> None:
+    """Close the shared provider HTTP client and its pooled connections."""
+    client = _http_state["client"]
+    _http_state["client"] = None
+    if client is not None:
+        await client.aclose()
+
+
+def _load_sender_config(db: Session):
+    """Read the Brevo sender overrides (blocking; run off the event loop)."""
+    return db.execute(SENDER_CONFIG_STMT).first()
+
+
+def _record_email_alerts(db: Session, rows: List[dict]) -> None:
+    """Store EmailAlert log rows (blocking; run off the event loop)."""
+    # One multi-row INSERT in a single transaction for all recipients
+    db.execute(insert(EmailAlert).values(rows))
+    db.commit()
 
 
 async def send_sms_message(to: str, text: str) -> None:
     """Send SMS message via Infobip API."""
-    print(f"[SMS_LOG] Starting SMS send process...")
-    print(f"[SMS_LOG] Recipient: {to}")
-    print(f"[SMS_LOG] Message: {text[:100]}...")
+    logger.debug("Sending SMS to %s", to)
     try:
         if not INFOBIP_API_KEY_SANITIZED or not INFOBIP_BASE_URL:
-            print(f"[SMS_LOG] ERROR: INFOBIP_API_KEY or INFOBIP_BASE_URL not set")
             logging.warning("INFOBIP_API_KEY or INFOBIP_BASE_URL not set; SMS will not be sent")
             return
         
-        print(f"[SMS_LOG] Configuring Infobip API client...")
-        client_config = Configuration(
-            host=INFOBIP_BASE_URL,
-            api_key={"APIKeyHeader": INFOBIP_API_KEY_SANITIZED},
-            api_key_prefix={"APIKeyHeader": "App"},
-        )
-        client_config.verify_ssl = False
-        api_client = ApiClient(client_config)
-        api_instance = SmsApi(api_client)
-        print(f"[SMS_LOG] Infobip API client configured successfully")
-        
-        sms_request = SmsRequest(
-            messages=[
-                SmsMessage(
-                    destinations=[SmsDestination(to=to)],
-                    sender=INFOBIP_SENDER,
-                    content=SmsMessageContent(actual_instance=SmsTextContent(text=text)),
-                )
+        sms_request = {
+            "messages": [
+                {
+                    "sender": INFOBIP_SENDER,
+                    "destinations": [{"to": to}],
+                    "content": {"text": text},
+                }
             ]
+        }
+        
+        response = await _post_with_retry(
+            INFOBIP_BASE_URL.rstrip("/") + INFOBIP_SMS_PATH,
+            headers=_INFOBIP_HEADERS,
+            content=orjson.dumps(sms_request),
         )
+
+        if not response.is_success:
+            logging.warning("SMS send failed: status=%s body=%s", response.status_code, response.text[:200])
+            return
         
         try:
-            print(f"[SMS_LOG] Sending SMS via Infobip API...")
-            api_response = await asyncio.get_event_loop().run_in_executor(
-                None, lambda: api_instance.send_sms_messages(sms_request=sms_request)
-            )
-            print(f"[SMS_LOG] SMS API response received")
+            resp_dict = response.json()
+        except ValueError:
+            resp_dict = None
             
-            try:
-                resp_dict = api_response.to_dict() if hasattr(api_response, "to_dict") else None
-            except Exception:
-                resp_dict = None
-            
-            if resp_dict:
-                messages = resp_dict.get("messages") or []
-                if messages:
-                    for m in messages:
-                        status = m.get("status") or {}
-                        logging.info(
-                            "SMS dispatch result to=%s status_name=%s group=%s description=%s messageId=%s",
-                            to,
-                            status.get("name"),
-                            status.get("groupName"),
-                            status.get("description"),
-                            m.get("messageId"),
-                        )
-                else:
-                    logging.info("SMS dispatch response contained no messages: %s", resp_dict)
+        if resp_dict:
+            messages = resp_dict.get("messages") or []
+            if messages:
+                for m in messages:
+                    status = m.get("status") or {}
+                    logging.info(
+                        "SMS dispatch result to=%s status_name=%s group=%s description=%s messageId=%s",
+                        to,
+                        status.get("name"),
+                        status.get("groupName"),
+                        status.get("description"),
+                        m.get("messageId"),
+                    )
             else:
-                logging.info("SMS dispatch raw response: %s", str(api_response))
-        except ApiException as ex:
-            print(f"[SMS_LOG] ERROR: Infobip API Exception - Status: {getattr(ex, 'status', None)}")
-            logging.warning(
-                "SMS send failed: status=%s body=%s",
-                getattr(ex, "status", None),
-                getattr(ex, "body", "")[:200],
-            )
-    except Exception as e:
-        print(f"[SMS_LOG] ERROR: SMS send exception - {str(e)[:200]}")
+                logging.info("SMS dispatch response contained no messages: %s", resp_dict)
+        else:
+            logging.info("SMS dispatch raw response: %s", response.text)
+    except Exception:
         logging.exception("SMS send exception")
 
 
 async def send_whatsapp_message(to: str, text: str) -> None:
     """Send WhatsApp message via Twilio API."""
-    print(f"[WHATSAPP_LOG] Starting WhatsApp send process...")
-    print(f"[WHATSAPP_LOG] Recipient: {to}")
-    print(f"[WHATSAPP_LOG] Message: {text[:100]}...")
     try:
         if not TWILIO_ACCOUNT_SID or not TWILIO_AUTH_TOKEN:
-            print(f"[WHATSAPP_LOG] ERROR: TWILIO_ACCOUNT_SID or TWILIO_AUTH_TOKEN not set")
             logging.warning("TWILIO_ACCOUNT_SID or TWILIO_AUTH_TOKEN not set; WhatsApp will not be sent")
             return
         
-        print(f"[WHATSAPP_LOG] Initializing Twilio client...")
-        client = TwilioClient(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-        
         # Format the recipient number for WhatsApp (add whatsapp: prefix if not present)
         if to.startswith("whatsapp:"):
             recipient = to
         else:
             recipient = f"whatsapp:{to}"
         
-        print(f"[WHATSAPP_LOG] Sending WhatsApp message via Twilio...")
-        print(f"[WHATSAPP_LOG] From: {TWILIO_WHATSAPP_FROM}, To: {recipient}")
-        message = client.messages.create(
-            from_=TWILIO_WHATSAPP_FROM,
-            body=text,
-            to=recipient
+        logger.debug("Sending WhatsApp message from %s to %s", TWILIO_WHATSAPP_FROM, recipient)
+        response = await _post_with_retry(
+            TWILIO_MESSAGES_URL.format(sid=TWILIO_ACCOUNT_SID),
+            auth=(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN),
+            data={"From": TWILIO_WHATSAPP_FROM, "To": recipient, "Body": text},
         )
         
-        print(f"[WHATSAPP_LOG] SUCCESS: WhatsApp message sent with SID: {message.sid}")
-        logging.info(f"WhatsApp dispatch result to={to} message_sid={message.sid} status={message.status}")
+        if not response.is_success:
+            logging.warning("WhatsApp send failed: status=%s body=%s", response.status_code, response.text[:200])
+            return
+
+        message = response.json()
+        logging.info("WhatsApp dispatch result to=%s message_sid=%s status=%s", to, message.get("sid"), message.get("status"))
         
-    except Exception as e:
-        error_msg = str(e)[:200]
-        print(f"[WHATSAPP_LOG] ERROR: WhatsApp send exception - {error_msg}")
+    except Exception:
         logging.exception("WhatsApp send exception")
 
 
@@ -148,108 +197,81 @@ async def send_email_message(
     db: Optional[Session] = None,
 ) -> None:
     """Send email via Brevo (Sendinblue) API."""
-    print(f"\n[BREVO_SEND] Entering send_email_message function")
     try:
-        print(f"[BREVO_SEND] Checking BREVO_API_KEY status...")
         if not BREVO_API_KEY:
-            print(f"[BREVO_SEND] ERROR: BREVO_API_KEY not set")
             logging.warning("BREVO_API_KEY not set; email will not be sent")
             return
         
-        print(f"[BREVO_SEND] BREVO_API_KEY is configured")
-        configuration = sib_api_v3_sdk.Configuration()
-        configuration.api_key["api-key"] = BREVO_API_KEY
-        api_client = sib_api_v3_sdk.ApiClient(configuration)
-        api_instance = sib_api_v3_sdk.TransactionalEmailsApi(api_client)
-        print(f"[BREVO_SEND] Brevo API client configured successfully")
-
         sender_email = BREVO_SENDER_EMAIL or ""
         sender_name = BREVO_SENDER_NAME or "IoT Alerts"
-        print(f"[BREVO_SEND] Initial sender - Email: {sender_email}, Name: {sender_name}")
         
         try:
             if db is not None:
-                print(f"[BREVO_SEND] Querying database for sender config...")
-                from .database import Settings
-                cfg = db.query(Settings).filter(Settings.id == 1).first()
+                # Only the two sender columns are needed; skip loading a full Settings object
+                cfg = await asyncio.to_thread(_load_sender_config, db)
                 if cfg:
-                    if getattr(cfg, "brevo_sender_email", None):
+                    if cfg.brevo_sender_email:
                         sender_email = cfg.brevo_sender_email
-                        print(f"[BREVO_SEND] Updated sender email from DB: {sender_email}")
-                    if getattr(cfg, "brevo_sender_name", None):
+                    if cfg.brevo_sender_name:
                         sender_name = cfg.brevo_sender_name
-                        print(f"[BREVO_SEND] Updated sender name from DB: {sender_name}")
-                else:
-                    print(f"[BREVO_SEND] No settings found in DB")
-        except Exception as e:
-            print(f"[BREVO_SEND] ERROR loading sender config from DB: {str(e)}")
+        except Exception:
             logging.exception("Failed to load sender config from DB; using defaults")
 
-        print(f"[BREVO_SEND] Preparing recipient list...")
-        to_list = [sib_api_v3_sdk.SendSmtpEmailTo(email=r.strip()) for r in recipients if r and r.strip()]
-        print(f"[BREVO_SEND] Recipients prepared: {[t.email for t in to_list]}")
+        to_list = [r.strip() for r in recipients if r and r.strip()]
         
         if not to_list:
-            print(f"[BREVO_SEND] ERROR: No valid recipients provided")
             logging.warning("No valid recipients provided; skipping email send")
             return
         
-        print(f"[BREVO_SEND] Creating SendSmtpEmail object...")
-        email = sib_api_v3_sdk.SendSmtpEmail(
-            to=to_list,
-            sender={"email": sender_email} if sender_email else None,
-            subject=subject,
-            html_content=body,
-        )
-        print(f"[BREVO_SEND] Email object created - Subject: {subject}")
+        email = {
+            "to": [{"email": r} for r in to_list],
+            "subject": subject,
+            "htmlContent": body,
+        }
+        if sender_email:
+            email["sender"] = {"email": sender_email, "name": sender_name}
+        logger.debug("Sending email to %s from %s <%s>", to_list, sender_name, sender_email)
 
-        print(f"[BREVO_SEND] Starting async email send via executor...")
         try:
-            send_result = await asyncio.get_event_loop().run_in_executor(
-                None, lambda: api_instance.send_transac_email(email)
+            response = await _post_with_retry(
+                BREVO_EMAIL_URL,
+                headers=_BREVO_HEADERS,
+                content=orjson.dumps(email),
             )
-            message_id = getattr(send_result, "message_id", None)
-            print(f"[BREVO_SEND] SUCCESS: Email sent with messageId: {message_id}")
-            logging.info("Email dispatch result: %s", message_id)
-            status = "SENT"
-            error_text = None
-        except BrevoApiException as ex:
-            status = "FAILED"
-            error_text = getattr(ex, "body", "")
-            error_status = getattr(ex, "status", None)
-            print(f"[BREVO_SEND] ERROR: BrevoApiException - Status: {error_status}, Body: {str(error_text)[:200]}")
-            logging.warning("Email send failed: status=%s body=%s", error_status, str(error_text)[:200])
-        except Exception as e:
+            if response.is_success:
+                message_id = response.json().get("messageId")
+                logging.info("Email dispatch result: %s", message_id)
+                status = "SENT"
+                error_text = None
+            else:
+                status = "FAILED"
+                error_text = response.text
+                logging.warning("Email send failed: status=%s body=%s", response.status_code, error_text[:200])
+        except Exception:
             status = "FAILED"
             error_text = "Unhandled exception during send"
-            print(f"[BREVO_SEND] ERROR: Unhandled exception - {str(e)}")
             logging.exception("Email send exception")
 
-        print(f"[BREVO_SEND] Recording email send status to database... Status: {status}")
         try:
             if db is not None:
-                for r in [t.email for t in to_list]:
-                    print(f"[BREVO_SEND] Recording email log for recipient: {r}")
-                    ea = EmailAlert(
-                        recipient=r,
-                        subject=subject,
-                        body=body,
-                        status=status,
-                        error=(str(error_text)[:400] if error_text else None),
-                        alert_record_id=alert_record_id,
-                        alert_cause=alert_cause,
-                    )
-                    db.add(ea)
-                db.commit()
-                print(f"[BREVO_SEND] Email logs persisted to database")
-        except Exception as e:
-            print(f"[BREVO_SEND] ERROR: Failed to persist EmailAlert logs - {str(e)}")
+                error = str(error_text)[:400] if error_text else None
+                await asyncio.to_thread(_record_email_alerts, db, [
+                    {
+                        "recipient": r,
+                        "subject": subject,
+                        "body": body,
+                        "status": status,
+                        "error": error,
+                        "alert_record_id": alert_record_id,
+                        "alert_cause": alert_cause,
+                    }
+                    for r in to_list
+                ])
+                logger.debug("Recorded %d email alert log rows", len(to_list))
+        except Exception:
             logging.exception("Failed to persist EmailAlert logs")
-    except Exception as e:
-        print(f"[BREVO_SEND] ERROR: Outer exception caught - {str(e)}")
+    except Exception:
         logging.exception("send_email_message exception")
-    
-    print(f"[BREVO_SEND] Exiting send_email_message function\n")
 
 
 async def send_email_with_logging(
@@ -1,20 +1,78 @@
 """Utility functions for CSV handling, weather API, and data processing."""
 import csv
 import os
+import time
+import ssl
 import asyncio
-from datetime import datetime
-from typing import Tuple, Optional
+import threading
+from datetime import date
+from functools import lru_cache
+from operator import itemgetter
+from typing import List, Tuple, Optional
 
+import certifi
 import httpx
 import logging
 
-from .config import OPENWEATHER_API_KEY, OPENWEATHER_BASE_URL, FIXED_LAT, FIXED_LON, BASE_DIR
+from .config import (
+    OPENWEATHER_API_KEY, OPENWEATHER_BASE_URL, WEATHER_CACHE_TTL_SECONDS, WEATHER_STALE_GRACE_SECONDS,
+    FIXED_LAT, FIXED_LON, BASE_DIR,
+    CSV_QUEUE_SIZE, CSV_BATCH_SIZE, CSV_FLUSH_INTERVAL_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+# Column order of the daily CSV export
+CSV_FIELDS = (
+    "timestamp", "device_id", "temperature", "humidity",
+    "outdoor_temperature", "weather_condition", "alert",
+    "ldr_value", "ldr_alert"
+)
+# Pulls a record's CSV_FIELDS values out as a row tuple (in C, without per-field .get calls)
+_csv_row = itemgetter(*CSV_FIELDS)
+
+# Weather cache: last result, when it was fetched, when the last successful fetch happened,
+# and the in-flight refresh shared by concurrent callers
+_weather_cache = {
+    "fetched_at": 0.0,
+    "good_at": 0.0,
+    "value": (None, None),
+    "inflight": None
+}
+
+# OpenWeather HTTP client, created on first use and reused so the TLS connection stays open
+_weather_http = {
+    "client": None
+}
+
+# CSV export: rows queued by the ingest endpoints and the task that writes them out
+_csv_state = {
+    "queue": None,
+    "writer": None
+}
+
+# Today's CSV export path and the date it was built for
+_csv_path_cache = {
+    "date": None,
+    "path": None
+}
+
+# Daily CSV file kept open between batches; rotated when the date (and so the path) changes
+_csv_file = {
+    "path": None,
+    "handle": None,
+    "writer": None,
+    "lock": threading.Lock()
+}
 
 
 def get_daily_csv_path() -> str:
-    """Get the path for today's daily CSV export file."""
-    date_str = datetime.now().strftime("%Y-%m-%d")
-    return os.path.join(BASE_DIR, "..", f"iot_{date_str}.csv")
+    """Get the path for today's daily CSV export file, rebuilt only when the date changes."""
+    today = date.today()
+    if _csv_path_cache["date"] != today:
+        _csv_path_cache["path"] = os.path.normpath(os.path.join(BASE_DIR, "..", f"iot_{today.isoformat()}.csv"))
+        _csv_path_cache["date"] = today
+    return _csv_path_cache["path"]
 
 
 def ensure_daily_csv_file():
@@ -22,47 +80,155 @@ def ensure_daily_csv_file():
     csv_path = get_daily_csv_path()
     if not os.path.exists(csv_path):
         with open(csv_path, "w", newline="") as csvfile:
-            writer = csv.DictWriter(
-                csvfile,
-                fieldnames=[
-                    "timestamp", "device_id", "temperature", "humidity",
-                    "outdoor_temperature", "weather_condition", "alert",
-                    "ldr_value", "ldr_alert"
-                ]
-            )
-            writer.writeheader()
-        print(f"[CSV] Created new daily CSV file: {csv_path}")
-
-
-async def append_record_to_csv(record: dict) -> None:
-    """Append a sensor record to the daily CSV file."""
+            csv.writer(csvfile).writerow(CSV_FIELDS)
+        logger.debug("Created new daily CSV file: %s", csv_path)
+
+
+def _close_csv_file() -> None:
+    """Close the open daily CSV file, if any. Caller holds the file lock."""
+    handle = _csv_file["handle"]
+    _csv_file["path"] = None
+    _csv_file["handle"] = None
+    _csv_file["writer"] = None
+    if handle is not None:
+        handle.close()
+
+
+def _daily_csv_writer():
+    """Return the writer for today's CSV file, rotating to a new file when the date changes."""
     csv_path = get_daily_csv_path()
-    ensure_daily_csv_file()
-    
+    if _csv_file["path"] != csv_path:
+        _close_csv_file()
+        ensure_daily_csv_file()
+        handle = open(csv_path, "a", newline="")
+        _csv_file["path"] = csv_path
+        _csv_file["handle"] = handle
+        _csv_file["writer"] = csv.writer(handle)
+    return _csv_file["writer"]
+
+
+def _write_csv_rows(records: List[dict]) -> None:
+    """Append a batch of rows to the daily CSV file (blocking file I/O)."""
+    with _csv_file["lock"]:
+        try:
+            writer = _daily_csv_writer()
+            writer.writerows(map(_csv_row, records))
+            _csv_file["handle"].flush()
+        except Exception:
+            logging.exception("Failed to append records to CSV")
+            # Reopen on the next batch rather than keep writing to a broken handle
+            try:
+                _close_csv_file()
+            except OSError:
+                pass
+
+
+def _close_daily_csv() -> None:
+    """Close the daily CSV file (blocking); used on shutdown."""
+    with _csv_file["lock"]:
+        _close_csv_file()
+
+
+async def _fill_csv_batch(queue: "asyncio.Queue[dict]", batch: List[dict]) -> None:
+    """Add queued rows to the batch until it holds CSV_BATCH_SIZE rows or the flush interval ends."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + CSV_FLUSH_INTERVAL_SECONDS
+    while len(batch) < CSV_BATCH_SIZE:
+        try:
+            batch.append(queue.get_nowait())
+            continue
+        except asyncio.QueueEmpty:
+            pass
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return
+        try:
+            batch.append(await asyncio.wait_for(queue.get(), remaining))
+        except asyncio.TimeoutError:
+            return
+
+
+async def _csv_writer(queue: "asyncio.Queue[dict]") -> None:
+    """Write queued CSV rows forever, one batch per flush interval or CSV_BATCH_SIZE rows."""
+    while True:
+        batch = [await queue.get()]
+        try:
+            await _fill_csv_batch(queue, batch)
+        finally:
+            # Rows already taken off the queue are written even if the writer is being cancelled
+            await asyncio.to_thread(_write_csv_rows, batch)
+
+
+def start_csv_writer() -> None:
+    """Create the CSV row queue and its writer task on the running event loop."""
+    if _csv_state["queue"] is not None:
+        return
+    queue = asyncio.Queue(maxsize=CSV_QUEUE_SIZE)
+    _csv_state["queue"] = queue
+    _csv_state["writer"] = asyncio.create_task(_csv_writer(queue))
+
+
+async def stop_csv_writer() -> None:
+    """Stop the CSV writer, flush any rows still queued and close the daily file."""
+    queue, writer = _csv_state["queue"], _csv_state["writer"]
+    _csv_state["queue"] = None
+    _csv_state["writer"] = None
+    if writer is not None:
+        writer.cancel()
+        try:
+            await writer
+        except asyncio.CancelledError:
+            pass
+    if queue is not None:
+        remaining = []
+        while not queue.empty():
+            remaining.append(queue.get_nowait())
+        if remaining:
+            await asyncio.to_thread(_write_csv_rows, remaining)
+    await asyncio.to_thread(_close_daily_csv)
+
+
+def append_record_to_csv(record: dict) -> None:
+    """Queue a sensor record for the daily CSV file; the write happens in the background.
+
+    The record must have a value (possibly None) for every column in CSV_FIELDS.
+    """
+    queue = _csv_state["queue"]
+    if queue is None:
+        # Writer not started (e.g. used outside the app); write on a worker thread
+        asyncio.create_task(asyncio.to_thread(_write_csv_rows, [record]))
+        return
     try:
-        with open(csv_path, "a", newline="") as csvfile:
-            writer = csv.DictWriter(
-                csvfile,
-                fieldnames=[
-                    "timestamp", "device_id", "temperature", "humidity",
-                    "outdoor_temperature", "weather_condition", "alert",
-                    "ldr_value", "ldr_alert"
-                ]
-            )
-            writer.writerow({
-                "timestamp": record.get("timestamp"),
-                "device_id": record.get("device_id"),
-                "temperature": record.get("temperature"),
-                "humidity": record.get("humidity"),
-                "outdoor_temperature": record.get("outdoor_temperature"),
-                "weather_condition": record.get("weather_condition"),
-                "alert": record.get("alert"),
-                "ldr_value": record.get("ldr_value"),
-                "ldr_alert": record.get("ldr_alert")
-            })
-    except Exception as e:
-        print(f"[CSV] ERROR appending to CSV: {str(e)}")
-        logging.exception("Failed to append record to CSV")
+        queue.put_nowait(record)
+    except asyncio.QueueFull:
+        logging.warning("CSV queue full; dropping record for device %s", record.get("device_id"))
+
+
+@lru_cache(maxsize=None)
+def tls_context() -> ssl.SSLContext:
+    """Verified TLS context over the certifi CA bundle, built once and shared by all outbound HTTP clients."""
+    return ssl.create_default_context(cafile=certifi.where())
+
+
+def _get_weather_client() -> httpx.AsyncClient:
+    """Return the shared OpenWeather HTTP client, creating it on first use."""
+    client = _weather_http["client"]
+    if client is None:
+        client = httpx.AsyncClient(
+            verify=tls_context(),
+            timeout=5.0,
+            limits=httpx.Limits(max_keepalive_connections=2)
+        )
+        _weather_http["client"] = client
+    return client
+
+
+async def close_weather_client() -> None:
+    """Close the shared OpenWeather HTTP client."""
+    client = _weather_http["client"]
+    _weather_http["client"] = None
+    if client is not None:
+        await client.aclose()
 
 
 async def fetch_weather() -> Tuple[Optional[float], Optional[str]]:
@@ -71,36 +237,62 @@ async def fetch_weather() -> Tuple[Optional[float], Optional[str]]:
         return None, None
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                OPENWEATHER_BASE_URL,
-                params={
-                    "lat": FIXED_LAT,
-                    "lon": FIXED_LON,
-                    "appid": OPENWEATHER_API_KEY,
-                    "units": "metric"
-                },
-                timeout=5.0
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                outdoor_temp = data.get("main", {}).get("temp")
-                condition = data.get("weather", [{}])[0].get("main", "Unknown")
-                print(f"[WEATHER] Fetched weather: {outdoor_temp}°C, {condition}")
-                return outdoor_temp, condition
-            else:
-                print(f"[WEATHER] OpenWeather API error: {response.status_code}")
-                return None, None
-    except asyncio.TimeoutError:
-        print("[WEATHER] OpenWeather API timeout")
+        response = await _get_weather_client().get(
+            OPENWEATHER_BASE_URL,
+            params={
+                "lat": FIXED_LAT,
+                "lon": FIXED_LON,
+                "appid": OPENWEATHER_API_KEY,
+                "units": "metric"
+            }
+        )
+        
+        if response.status_code == 200:
+            data = response.json()
+            outdoor_temp = data.get("main", {}).get("temp")
+            condition = data.get("weather", [{}])[0].get("main", "Unknown")
+            logger.debug("Fetched weather: %s°C, %s", outdoor_temp, condition)
+            return outdoor_temp, condition
+        else:
+            logging.warning("OpenWeather API error: %s", response.status_code)
+            return None, None
+    except httpx.TimeoutException:
+        logging.warning("OpenWeather API timeout")
         return None, None
-    except Exception as e:
-        print(f"[WEATHER] Error fetching weather: {str(e)}")
+    except Exception:
         logging.exception("Failed to fetch weather")
         return None, None
 
 
+async def _refresh_weather() -> Tuple[Optional[float], Optional[str]]:
+    """Fetch weather and store it in the cache, keeping the last good reading through short outages."""
+    try:
+        value = await fetch_weather()
+        now = time.monotonic()
+        if value != (None, None):
+            _weather_cache["value"] = value
+            _weather_cache["good_at"] = now
+        elif now - _weather_cache["good_at"] > WEATHER_STALE_GRACE_SECONDS:
+            _weather_cache["value"] = value
+        _weather_cache["fetched_at"] = now
+        return _weather_cache["value"]
+    finally:
+        _weather_cache["inflight"] = None
+
+
+async def cached_weather() -> Tuple[Optional[float], Optional[str]]:
+    """Return outdoor weather, fetching it at most once per TTL window."""
+    if time.monotonic() - _weather_cache["fetched_at"] < WEATHER_CACHE_TTL_SECONDS:
+        return _weather_cache["value"]
+    
+    # Single-flight: concurrent callers during a refresh await the same request
+    inflight = _weather_cache["inflight"]
+    if inflight is None:
+        inflight = asyncio.ensure_future(_refresh_weather())
+        _weather_cache["inflight"] = inflight
+    return await asyncio.shield(inflight)
+
+
 def validate_temperature_readings(
     ds18b20_temp: Optional[float],
     dht_temp: Optional[float]
@@ -112,27 +304,17 @@ def validate_temperature_readings(
     ds18b20_ok = ds18b20_temp is not None and -40 <= ds18b20_temp <= 125
     dht_ok = dht_temp is not None and -40 <= dht_temp <= 80
     
-    sensor_disagreement = False
-    temperature = None
-    temperature_source = None
-    
-    if ds18b20_ok and dht_ok:
-        disagreement = abs(ds18b20_temp - dht_temp)
-        sensor_disagreement = disagreement > 2.0
-        
-        if sensor_disagreement:
-            print(f"[SENSOR_VALIDATION] Sensor disagreement: DS18B20={ds18b20_temp:.1f}°C, DHT={dht_temp:.1f}°C (diff={disagreement:.1f}°C)")
-        
-        # Use DS18B20 as primary if available
-        temperature = ds18b20_temp
-        temperature_source = "DS18B20"
-    elif ds18b20_ok:
-        temperature = ds18b20_temp
-        temperature_source = "DS18B20"
+    # DS18B20 is the primary sensor; DHT is only used when DS18B20 is out of range
+    if ds18b20_ok:
+        temperature, temperature_source = ds18b20_temp, "DS18B20"
     elif dht_ok:
-        temperature = dht_temp
-        temperature_source = "DHT"
+        temperature, temperature_source = dht_temp, "DHT"
     else:
         raise ValueError("Both temperature sensors are out of range")
     
+    sensor_disagreement = ds18b20_ok and dht_ok and abs(ds18b20_temp - dht_temp) > 2.0
+    if sensor_disagreement and logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Sensor disagreement: DS18B20=%.1f°C, DHT=%.1f°C (diff=%.1f°C)",
+                     ds18b20_temp, dht_temp, abs(ds18b20_temp - dht_temp))
+    
     return temperature, temperature_source, ds18b20_ok, dht_ok, sensor_disagreement
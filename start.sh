@@ -22,7 +22,7 @@ else
     exit 1
 fi
 
-python -m uvicorn backend.main:app --host 127.0.0.1 --port 8003 &
+python -m uvicorn backend.main:app --host 127.0.0.1 --port 8003 --ws-ping-interval 30 &
 BACKEND_PID=$!
 echo "Backend started with PID: $BACKEND_PID"
 